@@ -0,0 +1,71 @@
+"""Numba kernels for the dashboard's numeric hot loops."""
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def bincount(values, edges):
+    """Count values into the equal-width bins described by edges.
+
+    Runs serially: a parallel kernel would start Numba's threading layer, which is
+    neither safe across gunicorn's preload fork nor, in its default workqueue
+    form, across the server's request threads. Values outside [edges[0], edges[-1]]
+    (including NaN) are skipped.
+    """
+    nbins = edges.shape[0] - 1
+    lo = edges[0]
+    hi = edges[nbins]
+    scale = nbins / (hi - lo)
+    out = np.zeros(nbins, np.int64)
+    for i in range(values.shape[0]):
+        v = values[i]
+        if v >= lo and v <= hi:
+            k = int((v - lo) * scale)
+            if k >= nbins:  # the last bin includes its right edge
+                k = nbins - 1
+            # Correct for rounding in the scaled index against the actual edges,
+            # the same way np.histogram does
+            if v < edges[k]:
+                k -= 1
+            elif k != nbins - 1 and v >= edges[k + 1]:
+                k += 1
+            if 0 <= k < nbins:
+                out[k] += 1
+    return out
+
+
+def histogram(values, nbins):
+    """Equivalent of np.histogram(values, bins=nbins) for arrays of finite values.
+
+    NaN and +/-inf must be filtered out first (e.g. values[np.isfinite(values)]),
+    since the bin range is taken from values.min() and values.max(). The edges are
+    built exactly as np.histogram builds them, so both return the same counts.
+
+    Returns (counts, edges).
+    """
+    if values.size:
+        lo, hi = values.min(), values.max()
+    else:
+        lo, hi = 0, 1  # np.histogram's range for empty input
+    if lo == hi:
+        lo, hi = lo - 0.5, hi + 0.5
+    bin_type = np.result_type(lo, hi, values)
+    if np.issubdtype(bin_type, np.integer):
+        bin_type = np.result_type(bin_type, float)
+    edges = np.linspace(lo, hi, nbins + 1, dtype=bin_type)
+    return bincount(values, edges), edges
+
+
+def warm_up():
+    """Compile bincount for the dtypes uploads can produce and check it against np.histogram.
+
+    The kernel starts no threads, so this is safe to run before a preload fork.
+    """
+    for dtype in (np.float32, np.float64, np.int8, np.int16, np.int32, np.int64):
+        # Values landing exactly on bin edges exercise the rounding correction
+        values = np.arange(-50, 51).astype(dtype)
+        for nbins in (1, 7, 20):
+            counts, edges = histogram(values, nbins)
+            expected, expected_edges = np.histogram(values, bins=nbins)
+            if not (np.array_equal(counts, expected) and np.array_equal(edges, expected_edges)):
+                raise RuntimeError(f"histogram kernel disagrees with np.histogram for {dtype.__name__}")
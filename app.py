@@ -1,4 +1,5 @@
 import base64
+import hashlib
 import io
 import os
 import dash
@@ -6,7 +7,14 @@ import dash_bootstrap_components as dbc
 from dash import dcc, html, Input, Output, State
 import plotly.express as px
 import plotly.graph_objects as go
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from pyarrow import csv as pac
+from flask_caching import Cache
+
+from _kernels import histogram, warm_up
 
 # ---------- Initialize the app ---------- #
 app = dash.Dash(
@@ -17,8 +25,140 @@ app = dash.Dash(
 server = app.server
 app.title = "Fancy CSV Dashboard"
 
-# A dcc.Store to hold the uploaded CSV data (in JSON) so multiple components can access it
-store_data = dcc.Store(id='stored-data', storage_type='session')
+# Compile (and sanity-check) the Numba kernels at startup rather than on the first
+# upload; they are serial, so this starts no threads before a gunicorn preload fork
+warm_up()
+
+# Limits that keep chart payloads small for large CSVs
+MAX_POINTS = 50000     # rows sampled for line/scatter charts
+HIST_BINS = 20         # bins computed server-side for the histogram
+PIE_BINS = 10          # value ranges shown as pie slices
+
+# Server-side cache for parsed DataFrames, keyed by a hash of the uploaded file.
+# The browser only holds the key, so every callback reuses the same parsed DataFrame.
+cache = Cache(server, config={
+    'CACHE_TYPE': 'FileSystemCache',
+    'CACHE_DIR': os.environ.get("CACHE_DIR", "/tmp/dash"),
+    'CACHE_DEFAULT_TIMEOUT': 3600,
+})
+
+
+def unique_columns(columns):
+    """Rename repeated column names the way pandas does (a, a.1, a.2, ...)."""
+    seen = set()
+    counts = {}
+    names = []
+    for col in map(str, columns):
+        name = col
+        while name in seen:
+            counts[col] = counts.get(col, 0) + 1
+            name = f"{col}.{counts[col]}"
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def read_csv_bytes(decoded):
+    """Parse raw CSV bytes into a DataFrame with uniquely named columns.
+
+    Arrow's multithreaded reader is tried first (no UTF-8 decode step).
+    Arrow infers column types from the first block only, so files where a later
+    row doesn't fit that type fall back to pandas' parser.
+    """
+    try:
+        table = pac.read_csv(pa.BufferReader(decoded),
+                             read_options=pac.ReadOptions(use_threads=True))
+    except pa.ArrowInvalid:
+        # low_memory=False infers each column's type from the whole file rather than
+        # per chunk, so mixed columns don't become int/str objects Feather rejects
+        df = pd.read_csv(io.BytesIO(decoded), low_memory=False)
+    else:
+        df = table.to_pandas(split_blocks=True, self_destruct=True)
+    df.columns = unique_columns(df.columns)
+    return df
+
+
+def save_frame(key, df):
+    """Serialize a DataFrame to Feather (Arrow IPC) bytes and cache it under key."""
+    buf = io.BytesIO()
+    feather.write_feather(df, buf, compression='lz4')
+    cache.set(key, buf.getvalue())
+
+
+def load_frame(key, columns=None):
+    """Return the cached DataFrame (or just columns) for key, or None if it is missing or expired."""
+    data = cache.get(key) if key else None
+    if data is None:
+        return None
+    return feather.read_feather(io.BytesIO(data), columns=columns)
+
+
+def numeric_columns(df):
+    """Return the names of the numeric columns of df, scanning dtypes directly."""
+    return [col for col, dtype in zip(df.columns, df.dtypes)
+            if isinstance(dtype, np.dtype) and np.issubdtype(dtype, np.number)]
+
+
+def empty_figure(text="No data"):
+    """Return a blank dark figure with a centered message."""
+    fig = go.Figure()
+    fig.update_layout(
+        template="plotly_dark",
+        annotations=[dict(text=text, x=0.5, y=0.5, showarrow=False)]
+    )
+    return fig
+
+
+def load_summary(key):
+    """Return the statistics precomputed at upload time for key, or None."""
+    return cache.get(f"{key}:summary") if key else None
+
+
+def prepare_and_cache(df, key):
+    """Shrink df's dtypes, precompute its summary and cache both under key."""
+    # Precompute everything that only depends on the data, so callbacks don't redo it.
+    # The means are taken before the downcast so the KPIs keep float64 accumulation.
+    numeric_cols = numeric_columns(df)
+    means = df[numeric_cols].mean().to_dict()
+
+    # Downcast numeric columns to the narrowest safe type to halve memory traffic
+    for col in df.select_dtypes(include='float').columns:
+        df[col] = pd.to_numeric(df[col], downcast='float')
+    for col in df.select_dtypes(include='integer').columns:
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+
+    # Store repetitive text columns as categories (small integer codes + a dictionary)
+    for col in df.select_dtypes(include='object').columns:
+        if df[col].nunique(dropna=False) < len(df) * 0.5:
+            df[col] = df[col].astype('category')
+
+    # Correlation via a single np.corrcoef on float32 when nothing is missing; with
+    # missing values, pandas' pairwise deletion keeps one sparse column from
+    # shrinking the sample for every other pair
+    corr = None
+    if len(numeric_cols) >= 2:
+        arr = df[numeric_cols].to_numpy(dtype=np.float32)
+        if np.isnan(arr).any():
+            corr = df[numeric_cols].corr().to_numpy()
+        else:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                corr = np.corrcoef(arr, rowvar=False)
+
+    summary = {
+        'numeric_cols': numeric_cols,
+        'means': means,
+        'corr': corr,
+    }
+
+    # Cache the DataFrame server-side; only its key is handed to the browser
+    save_frame(key, df)
+    cache.set(f"{key}:summary", summary)
+    return key
+
+
+# A dcc.Store to hold the cache key of the uploaded CSV so multiple components can access it
+# Only a short key is kept, in memory, so nothing dataset-sized is written to the browser
+store_data = dcc.Store(id='stored-data', storage_type='memory')
 
 # ---------- Navbar ---------- #
 navbar = dbc.NavbarSimple(
@@ -29,14 +169,14 @@ navbar = dbc.NavbarSimple(
 )
 
 # ---------- KPI Cards Row ---------- #
-# We will dynamically update these after the CSV is uploaded and parsed.
+# We will dynamically update these after the CSV is uploaded and parsed ("-" until then).
 kpi_cards = dbc.Row([
     dbc.Col(
         dbc.Card(
             [
                 dbc.CardHeader("KPI 1"),
                 dbc.CardBody(
-                    html.H4(id="kpi-1-value", className="card-title")
+                    html.H4("-", id="kpi-1-value", className="card-title")
                 ),
             ],
             className="mb-2"
@@ -47,7 +187,7 @@ kpi_cards = dbc.Row([
             [
                 dbc.CardHeader("KPI 2"),
                 dbc.CardBody(
-                    html.H4(id="kpi-2-value", className="card-title")
+                    html.H4("-", id="kpi-2-value", className="card-title")
                 ),
             ],
             className="mb-2"
@@ -58,7 +198,7 @@ kpi_cards = dbc.Row([
             [
                 dbc.CardHeader("KPI 3"),
                 dbc.CardBody(
-                    html.H4(id="kpi-3-value", className="card-title")
+                    html.H4("-", id="kpi-3-value", className="card-title")
                 ),
             ],
             className="mb-2"
@@ -69,7 +209,7 @@ kpi_cards = dbc.Row([
             [
                 dbc.CardHeader("KPI 4"),
                 dbc.CardBody(
-                    html.H4(id="kpi-4-value", className="card-title")
+                    html.H4("-", id="kpi-4-value", className="card-title")
                 ),
             ],
             className="mb-2"
@@ -114,24 +254,24 @@ filters_section = dbc.Row([
 ], className="mb-2")
 
 # ---------- Charts Section ---------- #
-# We'll create 5 placeholders for our charts:
+# We'll create 5 placeholders for our charts (showing "No data" until a CSV is uploaded):
 #  1) Bar or Histogram
 #  2) Pie
 #  3) Line
 #  4) Scatter
 #  5) Correlation Heatmap
 charts_section = dbc.Row([
-    dbc.Col(dcc.Graph(id="chart-1"), md=6),
-    dbc.Col(dcc.Graph(id="chart-2"), md=6),
+    dbc.Col(dcc.Graph(id="chart-1", figure=empty_figure()), md=6),
+    dbc.Col(dcc.Graph(id="chart-2", figure=empty_figure()), md=6),
 ], className="mb-2")
 
 charts_section_2 = dbc.Row([
-    dbc.Col(dcc.Graph(id="chart-3"), md=6),
-    dbc.Col(dcc.Graph(id="chart-4"), md=6),
+    dbc.Col(dcc.Graph(id="chart-3", figure=empty_figure()), md=6),
+    dbc.Col(dcc.Graph(id="chart-4", figure=empty_figure()), md=6),
 ], className="mb-2")
 
 heatmap_section = dbc.Row([
-    dbc.Col(dcc.Graph(id="heatmap-chart"), md=12),
+    dbc.Col(dcc.Graph(id="heatmap-chart", figure=empty_figure()), md=12),
 ], className="mb-2")
 
 # ---------- Layout Assembly ---------- #
@@ -149,50 +289,47 @@ app.layout = dbc.Container([
 
 # ========== CALLBACKS ========== #
 
-# 1) Parse the CSV on upload and store it in session memory
+# 1) Parse the CSV on upload, cache it server-side and store its key in the browser
 @app.callback(
     Output('stored-data', 'data'),
     Output('upload-status', 'children'),
     Input('upload-data', 'contents'),
-    State('upload-data', 'filename')
+    State('upload-data', 'filename'),
+    prevent_initial_call=True
 )
 def store_csv(contents, filename):
-    if contents is None:
-        return None, ""
-
     # Basic check for CSV
     if 'csv' not in filename.lower():
         return None, dbc.Alert("Please upload a .csv file.", color="danger")
 
-    content_type, content_string = contents.split(',')
+    # Strip the "data:<type>;base64," header; the decoded bytes go to the parser as-is
+    content_string = contents.partition(',')[2]
     decoded = base64.b64decode(content_string)
 
     try:
-        df = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
+        df = read_csv_bytes(decoded)
+        if df.empty:
+            return None, dbc.Alert("Uploaded CSV is empty.", color="warning")
+        key = prepare_and_cache(df, hashlib.md5(decoded).hexdigest())
     except Exception as e:
         return None, dbc.Alert(f"Error processing file: {e}", color="danger")
 
-    if df.empty:
-        return None, dbc.Alert("Uploaded CSV is empty.", color="warning")
-
-    # Store entire DataFrame in JSON
-    return df.to_json(date_format='iso', orient='split'), dbc.Alert("File uploaded successfully!", color="success")
+    return key, dbc.Alert("File uploaded successfully!", color="success")
 
 
 # 2) Populate the numeric column dropdowns AFTER we have the stored data
 @app.callback(
     Output("numeric-column-dropdown", "options"),
     Output("numeric-column-dropdown-2", "options"),
-    Input("stored-data", "data")
+    Input("stored-data", "data"),
+    prevent_initial_call=True
 )
-def populate_numeric_dropdowns(json_data):
-    if not json_data:
+def populate_numeric_dropdowns(key):
+    summary = load_summary(key)
+    if summary is None:
         return [], []
-    df = pd.read_json(json_data, orient='split')
 
-    # Identify numeric columns
-    numeric_cols = df.select_dtypes(include='number').columns
-    options = [{"label": col, "value": col} for col in numeric_cols]
+    options = [{"label": col, "value": col} for col in summary['numeric_cols']]
 
     return options, options
 
@@ -203,107 +340,216 @@ def populate_numeric_dropdowns(json_data):
     Output("kpi-2-value", "children"),
     Output("kpi-3-value", "children"),
     Output("kpi-4-value", "children"),
-    Input("stored-data", "data")
+    Input("stored-data", "data"),
+    prevent_initial_call=True
 )
-def update_kpis(json_data):
-    if not json_data:
+def update_kpis(key):
+    summary = load_summary(key)
+    if summary is None:
         return "-", "-", "-", "-"
 
-    df = pd.read_json(json_data, orient='split')
-
     # Example KPI logic:
     # Just pick the first 4 numeric columns (if they exist) and show their mean
-    numeric_cols = df.select_dtypes(include='number').columns
-    values = []
-    for i in range(4):
-        if i < len(numeric_cols):
-            col_mean = df[numeric_cols[i]].mean()
-            values.append(f"{numeric_cols[i]} Avg: {col_mean:.2f}")
-        else:
-            values.append("-")
+    means = summary['means']
+    values = [f"{col} Avg: {means[col]:.2f}" for col in summary['numeric_cols'][:4]]
+    values += ["-"] * (4 - len(values))
 
     return values[0], values[1], values[2], values[3]
 
 
-# 4) Generate charts based on user selections
+# ---------- Chart helpers ---------- #
+def resolve_columns(key, col1, col2=None):
+    """Default unselected or non-numeric column choices.
+
+    col1 falls back to the first numeric column and col2 to the second one (or None).
+    Returns (None, None) when the frame or its summary is no longer cached, or when
+    there is no numeric column.
+    """
+    summary = load_summary(key)
+    if summary is None or not cache.has(key) or not summary['numeric_cols']:
+        return None, None
+    numeric_cols = summary['numeric_cols']
+
+    if not col1 or col1 not in numeric_cols:
+        col1 = numeric_cols[0]
+    if not col2 or col2 not in numeric_cols:
+        col2 = numeric_cols[1] if len(numeric_cols) > 1 else None
+    return col1, col2
+
+
+def sample_points(df):
+    """Downsample large datasets for the point-based charts (kept in index order)."""
+    if len(df) > MAX_POINTS:
+        return df.sample(MAX_POINTS, random_state=0).sort_index()
+    return df
+
+
+# The *_figure builders are memoized on (dataset key, resolved columns) and return
+# plain dicts, so flipping back to an earlier selection is a cache lookup and the
+# cached values stay JSON-serializable. The callbacks only call them once the
+# dataset is known to be cached; if it is evicted in between, the builder returns
+# None, which memoize treats as a miss, so an empty figure is never served from
+# the cache after the data is uploaded again.
+
+@cache.memoize(timeout=3600)
+def histogram_figure(key, col1):
+    """Histogram of col1, binned on the server so only the counts are sent."""
+    df = load_frame(key, columns=[col1])
+    if df is None:
+        return None
+
+    vals = df[col1].to_numpy()
+    counts, edges = histogram(vals[np.isfinite(vals)], HIST_BINS)
+    centers = (edges[:-1] + edges[1:]) / 2
+    fig = go.Figure(go.Bar(x=centers, y=counts, width=np.diff(edges)))
+    fig.update_layout(template="plotly_dark", title=f"Histogram of {col1}",
+                      xaxis_title=col1, yaxis_title="count", bargap=0)
+    return fig.to_dict()
+
+
+@cache.memoize(timeout=3600)
+def pie_figure(key, col1):
+    """Pie chart of col1 split into equal-width value ranges."""
+    df = load_frame(key, columns=[col1])
+    if df is None:
+        return None
+
+    # pd.cut can't bin infinite values (and needs at least one finite one)
+    values = df[col1][np.isfinite(df[col1])]
+    if values.empty:
+        return empty_figure(f"No finite values in {col1}").to_dict()
+
+    df_pie = pd.cut(values, bins=PIE_BINS).value_counts(sort=False)
+    fig = px.pie(names=df_pie.index.astype(str), values=df_pie.to_numpy(), title=f"Pie Chart of {col1}")
+    fig.update_layout(template="plotly_dark")
+    return fig.to_dict()
+
+
+# The line and scatter charts are built from NumPy arrays so Plotly serializes them
+# as base64-encoded typed arrays instead of one JSON token per point. Decoding these
+# needs plotly.js >= 2.35, which is what the pinned Dash release bundles.
+
+@cache.memoize(timeout=3600)
+def line_figure(key, col1):
+    """Line chart of col1 over the index."""
+    df = load_frame(key, columns=[col1])
+    if df is None:
+        return None
+
+    plot_df = sample_points(df)
+    fig = go.Figure(go.Scatter(x=plot_df.index.to_numpy(), y=plot_df[col1].to_numpy(),
+                               mode="lines"))
+    fig.update_layout(template="plotly_dark", title=f"Line Chart of {col1} over Index",
+                      xaxis_title="index", yaxis_title=col1)
+    return fig.to_dict()
+
+
+@cache.memoize(timeout=3600)
+def scatter_figure(key, col1, col2):
+    """Scatter plot of col1 vs col2, rendered with WebGL."""
+    df = load_frame(key, columns=list(dict.fromkeys([col1, col2])))
+    if df is None:
+        return None
+
+    plot_df = sample_points(df)
+    fig = go.Figure(go.Scattergl(x=plot_df[col1].to_numpy(), y=plot_df[col2].to_numpy(),
+                                 mode="markers", marker=dict(size=3)))
+    fig.update_layout(template="plotly_dark", title=f"Scatter: {col1} vs {col2}",
+                      xaxis_title=col1, yaxis_title=col2)
+    return fig.to_dict()
+
+
+@cache.memoize(timeout=3600)
+def heatmap_figure(key):
+    """Correlation heatmap of the numeric columns, from the matrix computed at upload."""
+    summary = load_summary(key)
+    if summary is None:
+        return None
+    numeric_cols = summary['numeric_cols']
+    if len(numeric_cols) < 2:
+        return empty_figure("Not enough numeric columns for Heatmap").to_dict()
+
+    fig = px.imshow(summary['corr'], x=numeric_cols, y=numeric_cols, text_auto=".2f",
+                    title="Correlation Heatmap")
+    fig.update_layout(template="plotly_dark")
+    return fig.to_dict()
+
+
+# 4) Generate charts based on user selections. Each chart has its own callback,
+#    listening only to the inputs it depends on, so Dash can build them concurrently
+#    and a change of the second column only rebuilds the scatter plot. The graphs
+#    start out with a static "No data" figure, so none of them run on page load.
+
+# Chart-1: Histogram
 @app.callback(
     Output("chart-1", "figure"),
+    Input("stored-data", "data"),
+    Input("numeric-column-dropdown", "value"),
+    prevent_initial_call=True
+)
+def update_histogram(key, col1):
+    col1, _ = resolve_columns(key, col1)
+    if col1 is None:
+        return empty_figure()
+    return histogram_figure(key, col1) or empty_figure()
+
+
+# Chart-2: Pie
+@app.callback(
     Output("chart-2", "figure"),
+    Input("stored-data", "data"),
+    Input("numeric-column-dropdown", "value"),
+    prevent_initial_call=True
+)
+def update_pie(key, col1):
+    col1, _ = resolve_columns(key, col1)
+    if col1 is None:
+        return empty_figure()
+    return pie_figure(key, col1) or empty_figure()
+
+
+# Chart-3: Line
+@app.callback(
     Output("chart-3", "figure"),
-    Output("chart-4", "figure"),
-    Output("heatmap-chart", "figure"),
     Input("stored-data", "data"),
     Input("numeric-column-dropdown", "value"),
-    Input("numeric-column-dropdown-2", "value")
+    prevent_initial_call=True
 )
-def update_charts(json_data, col1, col2):
-    # Default empty figures
-    empty_fig = go.Figure()
-    empty_fig.update_layout(
-        template="plotly_dark",
-        annotations=[dict(text="No data", x=0.5, y=0.5, showarrow=False)]
-    )
-    if not json_data:
-        return empty_fig, empty_fig, empty_fig, empty_fig, empty_fig
+def update_line(key, col1):
+    col1, _ = resolve_columns(key, col1)
+    if col1 is None:
+        return empty_figure()
+    return line_figure(key, col1) or empty_figure()
 
-    df = pd.read_json(json_data, orient='split')
-    numeric_cols = df.select_dtypes(include='number').columns
 
-    # If user hasn't selected columns or if columns aren't numeric, default them
-    if not col1 or col1 not in numeric_cols:
-        if len(numeric_cols) > 0:
-            col1 = numeric_cols[0]
-        else:
-            return empty_fig, empty_fig, empty_fig, empty_fig, empty_fig
+# Chart-4: Scatter (col1 vs col2) if col2 exists
+@app.callback(
+    Output("chart-4", "figure"),
+    Input("stored-data", "data"),
+    Input("numeric-column-dropdown", "value"),
+    Input("numeric-column-dropdown-2", "value"),
+    prevent_initial_call=True
+)
+def update_scatter(key, col1, col2):
+    col1, col2 = resolve_columns(key, col1, col2)
+    if col1 is None:
+        return empty_figure()
+    if not col2:
+        return empty_figure("Not enough numeric columns for Scatter Plot")
+    return scatter_figure(key, col1, col2) or empty_figure()
 
-    if not col2 or col2 not in numeric_cols:
-        if len(numeric_cols) > 1:
-            col2 = numeric_cols[1]
-        else:
-            col2 = None
-
-    # 1) Chart-1: Bar or Histogram of col1
-    fig1 = px.histogram(df, x=col1, nbins=20, title=f"Histogram of {col1}")
-    fig1.update_layout(template="plotly_dark")
-
-    # 2) Chart-2: Pie chart of col1 binned or value_counts?
-    #    For numeric data, let's do a binned approach or just do a value_counts approach.
-    #    Alternatively, if it's truly numeric, a pie might not be as meaningful, but let's try:
-    df_pie = df[col1].value_counts().reset_index()
-    df_pie.columns = [col1, "Count"]
-    fig2 = px.pie(df_pie, names=col1, values="Count", title=f"Pie Chart of {col1}")
-    fig2.update_layout(template="plotly_dark")
-
-    # 3) Chart-3: Line chart of col1 over the index
-    fig3 = px.line(df, y=col1, title=f"Line Chart of {col1} over Index")
-    fig3.update_layout(template="plotly_dark")
-
-    # 4) Chart-4: Scatter plot (col1 vs col2) if col2 exists
-    if col2:
-        fig4 = px.scatter(df, x=col1, y=col2, title=f"Scatter: {col1} vs {col2}")
-        fig4.update_layout(template="plotly_dark")
-    else:
-        fig4 = go.Figure()
-        fig4.update_layout(
-            template="plotly_dark",
-            annotations=[dict(text="Not enough numeric columns for Scatter Plot", 
-                              x=0.5, y=0.5, showarrow=False)]
-        )
-
-    # 5) Correlation heatmap if at least 2 numeric columns exist
-    if len(numeric_cols) >= 2:
-        corr = df[numeric_cols].corr()
-        fig5 = px.imshow(corr, text_auto=True, title="Correlation Heatmap")
-        fig5.update_layout(template="plotly_dark")
-    else:
-        fig5 = go.Figure()
-        fig5.update_layout(
-            template="plotly_dark",
-            annotations=[dict(text="Not enough numeric columns for Heatmap", 
-                              x=0.5, y=0.5, showarrow=False)]
-        )
-
-    return fig1, fig2, fig3, fig4, fig5
+
+# Chart-5: Correlation heatmap if at least 2 numeric columns exist
+@app.callback(
+    Output("heatmap-chart", "figure"),
+    Input("stored-data", "data"),
+    prevent_initial_call=True
+)
+def update_heatmap(key):
+    summary = load_summary(key)
+    if summary is None or not summary['numeric_cols']:
+        return empty_figure()
+    return heatmap_figure(key) or empty_figure()
 
 
 # ---------- Run the App ---------- #